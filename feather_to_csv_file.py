@@ -1,4 +1,5 @@
-import pandas as pd
+import pyarrow.feather as pf
+from pyarrow import csv as pacsv
 
 
 input_file = "/Users/pradhyumnyadav/Desktop/multify/nifty50_processed/ADANIENT_2025-10-31.feather"
@@ -6,8 +7,9 @@ input_file = "/Users/pradhyumnyadav/Desktop/multify/nifty50_processed/ADANIENT_2
 output_file = "BajajAuto_2025-10-31.csv"
 
 
-df = pd.read_feather(input_file)
+# memory-mapped read straight into Arrow's batched CSV writer (no pandas frame)
+table = pf.read_table(input_file, memory_map=True)
 
-df.to_csv(output_file, index=False)
+pacsv.write_csv(table, output_file, write_options=pacsv.WriteOptions(batch_size=65536))
 
 print("Conversion complete! CSV saved as:", output_file)
@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from pyarrow import csv as pacsv
+import pyarrow.compute as pc
 from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
 from datetime import datetime
 import re
 import warnings
@@ -10,6 +16,12 @@ warnings.filterwarnings('ignore')
 MASTER_CSV = "GFDLNFO_BACKADJUSTED_31102025.csv"
 SAMPLE_FEATHER = "ACC_2024-05-07.feather"
 OUTPUT_DIR = "nifty50_processed"
+ANALYSIS_DIR = "nifty50_analysis"
+
+# stream the master CSV in blocks of this many bytes (e.g. 256 << 20) and
+# keep only NIFTY 50 rows, for when the file does not fit in RAM;
+# None loads it in one go
+CSV_BLOCK_SIZE = None
 
 NIFTY50_SYMBOLS = [
     'ADANIENT', 'ADANIPORTS', 'APOLLOHOSP', 'ASIANPAINT', 'AXISBANK',
@@ -24,6 +36,33 @@ NIFTY50_SYMBOLS = [
     'TCS', 'TITAN', 'ULTRACEMCO', 'UPL', 'WIPRO'
 ]
 
+# futures: SYMBOL-I/II/III, options: SYMBOL + EXPIRY + STRIKE + CE/PE,
+# both with an optional .NFO suffix
+FUT_RE = re.compile(r'^([A-Z&-]+?)-(I|II|III)(?:\.NFO)?$')
+OPT_RE = re.compile(r'^([A-Z&-]+?)(\d{2}[A-Z]{3}\d{2})(\d+)(CE|PE)(?:\.NFO)?$')
+
+CSV_COLUMN_TYPES = {
+    'Ticker': pa.string(),
+    'Date': pa.string(),
+    'Time': pa.string(),
+    'Open': pa.float64(),
+    'High': pa.float64(),
+    'Low': pa.float64(),
+    'Close': pa.float64(),
+    'Volume': pa.float64(),
+    'Open Interest': pa.float64()
+}
+
+# csv field -> wide column suffix
+FIELDS_MAP = {
+    'Close': 'Close',
+    'High': 'High',
+    'Low': 'Low',
+    'Open': 'Open',
+    'Open Interest': 'Open_Interest',
+    'Volume': 'Volume'
+}
+
 
 def parse_ticker(ticker_str):
     """
@@ -33,12 +72,10 @@ def parse_ticker(ticker_str):
         'RELIANCE25NOV252000CE.NFO' -> ('RELIANCE', '25NOV25', 2000, 'CE', 'OPTION')
         'RELIANCE28NOV25FUT.NFO' -> ('RELIANCE', '28NOV25', None, 'FUT', 'FUTURE')
     """
-    ticker = str(ticker_str).replace('.NFO', '')
+    ticker = str(ticker_str)
     
     # match futures: SYMBOL-I/II/III
-    
-    fut_pattern = r'^([A-Z&-]+?)-(I|II|III)$'
-    fut_match = re.match(fut_pattern, ticker)
+    fut_match = FUT_RE.match(ticker)
     if fut_match:
         symbol = fut_match.group(1)
         bucket_suffix = fut_match.group(2) # I, II, or III
@@ -46,8 +83,7 @@ def parse_ticker(ticker_str):
         return symbol, bucket, None, 'FUT', 'FUTURE'
     
     # match options: SYMBOL + EXPIRY + STRIKE + CE/PE
-    opt_pattern = r'^([A-Z&-]+?)(\d{2}[A-Z]{3}\d{2})(\d+)(CE|PE)$'
-    opt_match = re.match(opt_pattern, ticker)
+    opt_match = OPT_RE.match(ticker)
     if opt_match:
         symbol = opt_match.group(1)
         expiry = opt_match.group(2)
@@ -58,6 +94,29 @@ def parse_ticker(ticker_str):
     return None, None, None, None, None
 
 
+def parse_tickers(tickers):
+    """
+    Vectorised parse_ticker over a Series of tickers
+    
+    Returns DataFrame with Ticker, Symbol, Expiry, Strike, OptType, Instrument
+    (Symbol is NaN for tickers matching neither pattern)
+    """
+    tickers = tickers.reset_index(drop=True)
+    fut = tickers.str.extract(FUT_RE)
+    opt = tickers.str.extract(OPT_RE)
+    is_fut = fut[0].notna()
+    is_opt = opt[0].notna()
+    
+    return pd.DataFrame({
+        'Ticker': tickers,
+        'Symbol': fut[0].where(is_fut, opt[0]),
+        'Expiry': ('FUT_' + fut[1]).where(is_fut, opt[1]),
+        'Strike': pd.to_numeric(opt[2]),
+        'OptType': opt[3].mask(is_fut, 'FUT'),
+        'Instrument': pd.Series(np.where(is_fut, 'FUTURE', np.where(is_opt, 'OPTION', None)))
+    })
+
+
 def determine_future_bucket(expiry_str, reference_date='31/10/2025'):
     """
     Determine if future is FUT_I (near), FUT_II (mid), or FUT_III (far)
@@ -91,57 +150,38 @@ def determine_future_bucket(expiry_str, reference_date='31/10/2025'):
         return 'FUT_I'  # Default
 
 
-def create_wide_dataframe(symbol, df_master, sample_df, file_date):
+def create_wide_dataframe(symbol, df_symbol, file_date):
     """
-    convert long-format data to wide-format matching sample structure
+    convert long-format data to wide-format with one column per contract field
+    
+    Keeps the Datetime helper column; match_sample() and sort_columns()
+    turn this into the processed and analysis layouts
     """
   
     print(f"Processing: {symbol}")
   
     
-    # filter data for this symbol
-    # match tickers starting with Symbol followed by digit (options) or hyphen (futures)
-    mask = df_master['Ticker'].str.contains(f'^{re.escape(symbol)}[\\d-]', na=False, regex=True)
-    df_symbol = df_master[mask].copy()
-    
-    if len(df_symbol) == 0:
+    if df_symbol is None or len(df_symbol) == 0:
         print(f" No data found")
         return None
     
     print(f"  Found {len(df_symbol):,} rows, {df_symbol['Ticker'].nunique()} unique contracts")
     
-    #parse all tickers
-    ticker_info = []
-    for ticker in df_symbol['Ticker'].unique():
-        sym, expiry, strike, opt_type, instrument = parse_ticker(ticker)
-        if sym == symbol:  # ensure exact match
-            ticker_info.append({
-                'Ticker': ticker,
-                'Symbol': sym,
-                'Expiry': expiry,
-                'Strike': strike,
-                'OptType': opt_type,
-                'Instrument': instrument
-            })
-    
-    if not ticker_info:
+    # parse all tickers, keeping only exact symbol matches
+    df_tickers = parse_tickers(pd.Series(df_symbol['Ticker'].unique()))
+    df_tickers = df_tickers[df_tickers['Symbol'] == symbol].reset_index(drop=True)
+    
+    if df_tickers.empty:
         print(f"No valid tickers parsed")
         return None
     
-    df_tickers = pd.DataFrame(ticker_info)
-    df_symbol = df_symbol.merge(df_tickers, on='Ticker')
+    df_symbol = df_symbol.merge(df_tickers, on=['Ticker', 'Symbol'])
     
     print(f"  Parsed {len(df_tickers)} contracts:")
     print(f"    - Futures: {len(df_tickers[df_tickers['Instrument'] == 'FUTURE'])}")
     print(f"    - Options: {len(df_tickers[df_tickers['Instrument'] == 'OPTION'])}")
     
-    # create datetime and get unique timestamps
-    df_symbol['Datetime'] = pd.to_datetime(
-        df_symbol['Date'] + ' ' + df_symbol['Time'],
-        format='%d/%m/%Y %H:%M:%S',
-        errors='coerce'
-    )
-    
+    # get unique timestamps
     unique_times = sorted(df_symbol['Datetime'].dropna().unique())
     print(f"  Time range: {len(unique_times)} timestamps")
     
@@ -150,70 +190,47 @@ def create_wide_dataframe(symbol, df_master, sample_df, file_date):
         'Datetime': unique_times,
         'FileDate': pd.to_datetime(file_date, format='%d/%m/%Y'),
         'Date': pd.to_datetime(file_date, format='%d/%m/%Y'),
-        'Time': [dt.strftime('%H:%M:%S') for dt in unique_times]
+        'Time': pd.DatetimeIndex(unique_times).strftime('%H:%M:%S').to_numpy()
     })
     
-    # add all columns from sample with NaN
-    for col in sample_df.columns:
-        if col not in result.columns:
-            result[col] = np.nan
-    
-    # process each contract and populate columns
-    fields_map = {
-        'Close': 'Close',
-        'High': 'High',
-        'Low': 'Low',
-        'Open': 'Open',
-        'Open Interest': 'Open_Interest',
-        'Volume': 'Volume'
-    }
-    
-    contracts_processed = 0
+    # column prefix per row: futures use their bucket, options strike + type
+    # (Int64 avoids "2600.0CE" format)
+    df_symbol['ColPrefix'] = np.where(
+        df_symbol['Instrument'] == 'FUTURE',
+        df_symbol['Expiry'],
+        df_symbol['Strike'].astype('Int64').astype(str) + df_symbol['OptType']
+    )
     
-    for _, contract in df_tickers.iterrows():
-        ticker = contract['Ticker']
-        instrument = contract['Instrument']
-        strike = contract['Strike']
-        opt_type = contract['OptType']
-        expiry = contract['Expiry']
-        
-        # get data for this contract
-        contract_data = df_symbol[df_symbol['Ticker'] == ticker].copy()
-        contract_data = contract_data.set_index('Datetime')
-        
-        # determine column prefix
-        if instrument == 'FUTURE':
-            # Expiry is already 'FUT_I', 'FUT_II', etc.
-            col_prefix = expiry
-        elif instrument == 'OPTION':
-            # Convert strike to int to avoid "2600.0CE" format
-            col_prefix = f"{int(strike)}{opt_type}"
-        else:
-            continue
-        
-        # map each field
-        for csv_field, col_suffix in fields_map.items():
-            col_name = f"{col_prefix}_{col_suffix}"
-            
-            if col_name in sample_df.columns:
-                # merge data - use proper index alignment
-                values = contract_data[csv_field]
-                for idx, val in values.items():
-                    mask = result['Datetime'] == idx
-                    if mask.any():
-                        result.loc[mask, col_name] = val
-        
-        contracts_processed += 1
+    # pivot to one row per timestamp; when two expiries share a prefix the
+    # later contract wins, same as filling them one after another
+    contract_order = pd.Index(df_tickers['Ticker']).get_indexer(df_symbol['Ticker'])
+    wide = (
+        df_symbol.iloc[np.argsort(contract_order, kind='stable')]
+        .dropna(subset=['Datetime'])
+        .drop_duplicates(subset=['Datetime', 'ColPrefix'], keep='last')
+        .pivot(index='Datetime', columns='ColPrefix', values=list(FIELDS_MAP))
+    )
+    # pivot upcasts mixed fields to float64, restore the narrow load dtypes
+    wide = wide.astype({col: df_symbol[col[0]].dtype for col in wide.columns})
+    wide.columns = [f"{prefix}_{FIELDS_MAP[field]}" for field, prefix in wide.columns]
+    result = result.join(wide, on='Datetime')
     
-    print(f"Processed {contracts_processed} contracts")
+    print(f"Processed {len(df_tickers)} contracts")
+    print(f"Created {len(result.columns.drop('Datetime'))} total columns")
     
-    # select only columns that exist in sample (in correct order)
-    final_cols = [col for col in sample_df.columns if col in result.columns]
-    result = result[final_cols]
+    return result
+
+
+def match_sample(result, sample_df):
+    """
+    Reshape a wide frame to the sample structure (processed layout)
+    """
+    # sample columns in sample order, missing ones as NaN
+    result = result.reindex(columns=sample_df.columns)
     
     # try to match dtypes
     for col in result.columns:
-        if col in sample_df.columns and col not in ['Datetime']:
+        if col not in ['Datetime']:
             try:
                 target_dtype = sample_df[col].dtype
                 if target_dtype in ['int32', 'int64']:
@@ -224,51 +241,214 @@ def create_wide_dataframe(symbol, df_master, sample_df, file_date):
             except:
                 pass
     
-    # remove datetime helper column ONLY if not in sample
-    if 'Datetime' in result.columns and 'Datetime' not in sample_df.columns:
+    return result
+
+
+def sort_columns(result):
+    """
+    Order a wide frame metadata first, then by strike (analysis layout)
+    """
+    # remove datetime helper column
+    if 'Datetime' in result.columns:
         result = result.drop(columns=['Datetime'])
+        
+    # sort columns: metadata first, then numerical strike order
+    metadata_cols = ['FileDate', 'Date', 'Time']
+    metadata_cols = [c for c in metadata_cols if c in result.columns]
+    
+    def get_col_sort_key(col_name):
+        """sort key for option columns: (strike, type, metric)"""
+        # regex to parse: 1200CE_Close -> (1200, 'CE', 'Close')
+        match = re.match(r'(\d+)(CE|PE)_(.+)', col_name)
+        if match:
+            strike = int(match.group(1))
+            opt_type = match.group(2)
+            metric = match.group(3)
+            # sort order: strike (int), type (CE<PE), metric (str)
+            return (strike, opt_type, metric)
+        # fallback for non-matching columns (futures etc)
+        return (float('inf'), col_name, '')
+
+    # get remaining columns and sort them numerically
+    other_cols = [c for c in result.columns if c not in metadata_cols]
+    other_cols.sort(key=get_col_sort_key)
     
-    print(f"Final shape: {result.shape}")
-    non_null = result.notna().sum().sum()
-    total = result.shape[0] * result.shape[1]
-    print(f"  Data density: {non_null:,}/{total:,} cells ({100*non_null/total:.1f}%)")
+    # reorder DataFrame
+    result = result[metadata_cols + other_cols]
     
-    return result
+    # prices fit in float32 for this layout only; match_sample() works from
+    # the exact float64 values
+    price_suffixes = ('_Close', '_High', '_Low', '_Open')
+    return result.astype({col: np.float32 for col in other_cols if col.endswith(price_suffixes)})
 
 
-def main():
-    """Main processing function"""
+# sample frame for match_sample(), set once per worker by _init_worker
+_sample_df = None
+
+
+def _init_worker(sample_df):
+    """Pool initializer: keep sample_df in the worker instead of per task"""
+    global _sample_df
+    _sample_df = sample_df
+
+
+def _process_symbol(symbol, df_symbol, file_date, output_files):
+    """
+    Build one symbol's wide frame once and save it in each requested
+    layout ('processed' and/or 'analysis'), returns True on success
+    """
+    try:
+        wide = create_wide_dataframe(symbol, df_symbol, file_date)
+        
+        if wide is None or len(wide) == 0:
+            print(f"Failed ({symbol}): No data generated")
+            return False
+        
+        for layout, output_file in output_files.items():
+            if layout == 'processed':
+                result_df = match_sample(wide, _sample_df)
+            else:
+                result_df = sort_columns(wide)
+            
+            print(f"Final shape ({layout}): {result_df.shape}")
+            non_null = result_df.notna().sum().sum()
+            total = result_df.shape[0] * result_df.shape[1]
+            print(f"  Data density: {non_null:,}/{total:,} cells ({100*non_null/total:.1f}%)")
+            
+            # save as feather (zstd-1: smaller than lz4 at similar speed)
+            result_df.reset_index(drop=True).to_feather(
+                output_file, compression='zstd', compression_level=1, chunksize=65536
+            )
+            print(f"Saved: {output_file}")
+        return True
+    
+    except Exception as e:
+        print(f"Error ({symbol}): {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def _table_to_frame(table):
+    """
+    Arrow table of master CSV rows -> DataFrame with a parsed Datetime,
+    narrowed counts and categorical Ticker/Symbol
+    """
+    # Volume / Open Interest are counts written as floats ("600.0"): narrow
+    # to int32, keeping float64 if a file has fractional or huge values
+    for field in ['Volume', 'Open Interest']:
+        try:
+            counts = pc.cast(table[field], pa.int32())
+            table = table.set_column(table.schema.get_field_index(field), field, counts)
+        except pa.ArrowInvalid:
+            pass
+    
+    # parse Date + Time into a single Datetime column once, at load
+    datetimes = pc.strptime(
+        pc.binary_join_element_wise(table['Date'], table['Time'], ' '),
+        format='%d/%m/%Y %H:%M:%S',
+        unit='ns',
+        error_is_null=True
+    )
+    table = table.append_column('Datetime', datetimes)
+    # nullable Int32 so missing counts stay missing instead of going float
+    df = table.to_pandas(
+        split_blocks=True, self_destruct=True, types_mapper={pa.int32(): pd.Int32Dtype()}.get
+    )
+    del table
+    
+    # tag rows with their parsed symbol once; both are categorical so
+    # filters and groupby work on integer codes
+    df['Ticker'] = df['Ticker'].astype('category')
+    df_tickers = parse_tickers(pd.Series(df['Ticker'].cat.categories))
+    df['Symbol'] = df['Ticker'].map(df_tickers.set_index('Ticker')['Symbol']).astype('category')
+    
+    return df
+
+
+def load_master():
+    """
+    Load master CSV with a parsed Datetime and categorical Ticker/Symbol
+    """
+    # pyarrow's multi-threaded reader, converted to pandas block by block
+    table = pacsv.read_csv(
+        MASTER_CSV,
+        convert_options=pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES)
+    )
+    return _table_to_frame(table)
+
+
+def split_by_symbol(df):
+    """
+    Split rows into {symbol: subframe} for NIFTY 50 symbols only
+    """
+    # only slice out NIFTY 50 symbols, other underlyings are never copied
+    row_indices = df.groupby('Symbol', observed=True, sort=False).indices
+    return {
+        symbol: df.iloc[row_indices[symbol]]
+        for symbol in NIFTY50_SYMBOLS if symbol in row_indices
+    }
+
+
+def load_master_chunked(block_size):
+    """
+    Stream master CSV block by block, keeping only NIFTY 50 rows
+    
+    Returns ({symbol: subframe}, first Date string, total rows read); peak
+    memory is one block plus the NIFTY 50 rows instead of the whole file
+    """
+    reader = pacsv.open_csv(
+        MASTER_CSV,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES)
+    )
+    
+    buckets = defaultdict(list)
+    file_date = None
+    n_rows = 0
+    for batch in reader:
+        chunk = _table_to_frame(pa.Table.from_batches([batch]))
+        n_rows += len(chunk)
+        if file_date is None and len(chunk) > 0:
+            file_date = chunk['Date'].iloc[0]
+        for symbol, sub in split_by_symbol(chunk).items():
+            buckets[symbol].append(sub)
+    
+    groups = {symbol: pd.concat(frames) for symbol, frames in buckets.items()}
+    return groups, file_date, n_rows
+
+
+def run(output_dirs):
+    """
+    Process all NIFTY 50 symbols in one pass, writing each layout in
+    output_dirs ({'processed': dir, 'analysis': dir}) from the same wide frame
+    """
    
     print("Data Loading Started")
-    # create output directory
-    output_path = Path(OUTPUT_DIR)
-    output_path.mkdir(parents=True, exist_ok=True)
-    
-    # load sample feather
-    print("Loading Sample Feather")
-    sample_df = pd.read_feather(SAMPLE_FEATHER)
-    print(f"Structure: {len(sample_df)} rows × {len(sample_df.columns)} columns")
+    # create output directories
+    output_paths = {layout: Path(d) for layout, d in output_dirs.items()}
+    for output_path in output_paths.values():
+        output_path.mkdir(parents=True, exist_ok=True)
+    
+    # load sample feather (only the processed layout needs it)
+    sample_df = None
+    if 'processed' in output_paths:
+        print("Loading Sample Feather")
+        sample_df = pd.read_feather(SAMPLE_FEATHER)
+        print(f"Structure: {len(sample_df)} rows × {len(sample_df.columns)} columns")
     
     # load master CSV
     print("Loading Master CSV")
-    df_master = pd.read_csv(
-        MASTER_CSV,
-        dtype={
-            'Ticker': 'str',
-            'Date': 'str',
-            'Time': 'str',
-            'Open': 'float64',
-            'High': 'float64',
-            'Low': 'float64',
-            'Close': 'float64',
-            'Volume': 'float64',
-            'Open Interest': 'float64'
-        }
-    )
-    print(f"Loaded: {len(df_master):,} rows × {len(df_master.columns)} columns")
+    if CSV_BLOCK_SIZE:
+        groups, file_date, n_rows = load_master_chunked(CSV_BLOCK_SIZE)
+        print(f"Loaded: {n_rows:,} rows (streamed, kept NIFTY 50 rows only)")
+    else:
+        df_master = load_master()
+        print(f"Loaded: {len(df_master):,} rows × {len(df_master.columns)} columns")
+        file_date = df_master['Date'].iloc[0]
+        groups = split_by_symbol(df_master)
     
     # get file date
-    file_date = df_master['Date'].iloc[0]
     date_obj = datetime.strptime(file_date, '%d/%m/%Y')
     date_str = date_obj.strftime('%Y-%m-%d')
     print(f"Date: {date_str}")
@@ -279,30 +459,47 @@ def main():
     success_count = 0
     failed = []
     
-    for symbol in NIFTY50_SYMBOLS:
-        try:
-            result_df = create_wide_dataframe(symbol, df_master, sample_df, file_date)
-            
-            if result_df is not None and len(result_df) > 0:
-                # save as feather
-                output_file = output_path / f"{symbol}_{date_str}.feather"
-                result_df.reset_index(drop=True).to_feather(output_file)
-                print(f"Saved: {output_file.name}")
+    # symbols are independent, so fan them out across cores; sample_df goes
+    # to each worker once, tasks only carry the symbol's own subframe
+    with ProcessPoolExecutor(
+        max_workers=os.cpu_count(), initializer=_init_worker, initargs=(sample_df,)
+    ) as ex:
+        futures = {
+            ex.submit(
+                _process_symbol, symbol, groups.get(symbol), file_date,
+                {
+                    layout: output_path / f"{symbol}_{date_str}.feather"
+                    for layout, output_path in output_paths.items()
+                }
+            ): symbol
+            for symbol in NIFTY50_SYMBOLS
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                # worker died (OOM kill, crash, unpicklable result)
+                print(f"Error ({symbol}): {e}")
+                ok = False
+            if ok:
                 success_count += 1
             else:
-                print(f"Failed: No data generated")
                 failed.append(symbol)
-                
-        except Exception as e:
-            print(f"Error: {e}")
-            failed.append(symbol)
+    failed.sort(key=NIFTY50_SYMBOLS.index)
     
     # summary
     
     print(f"Successfully processed: {success_count}/{len(NIFTY50_SYMBOLS)} symbols")
     if failed:
         print(f"Failed ({len(failed)}): {', '.join(failed)}")
-    print(f"\nOutput directory: {output_path.absolute()}")
+    for output_path in output_paths.values():
+        print(f"\nOutput directory: {output_path.absolute()}")
+
+
+def main():
+    """Main processing function: writes processed and analysis layouts"""
+    run({'processed': OUTPUT_DIR, 'analysis': ANALYSIS_DIR})
     
 
 